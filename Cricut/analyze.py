@@ -0,0 +1,325 @@
+import sys
+import json
+import argparse
+import numpy as np
+import shapely
+from shapely import affinity
+from shapely.geometry import box, Polygon
+from svgpathtools import svg2paths2
+from path_utils import (
+    paths_to_zigzag_paths,
+    filter_paths_by_color,
+    svgpath_to_shapely_polygon,
+    _units_per_inch
+)
+from main import prepare_value_geometry, get_paths_to_hatch, select_paths_to_outline
+from config import Config
+
+
+def _empty_stats():
+    return {
+        "strokes": 0,
+        "draw_length": 0.0,
+        "pen_up_travel": 0.0,
+        "vertices": 0,
+    }
+
+
+def _add_stats(total, stats):
+    for key in total:
+        total[key] += stats[key]
+
+
+def measure_paths(paths, cursor=0j):
+    """Measure already materialized paths in drawing order.
+
+    Every discontinuity inside a path counts as a pen lift, so compound
+    outline paths report one stroke per subpath. Returns the stats and the
+    position the pen ends at.
+    """
+    stats = _empty_stats()
+    for path in paths:
+        prev_end = None
+        for seg in path:
+            if prev_end is None or abs(seg.start - prev_end) > 1e-6:
+                stats["strokes"] += 1
+                stats["vertices"] += 1
+                stats["pen_up_travel"] += abs(seg.start - cursor)
+            stats["draw_length"] += seg.length()
+            stats["vertices"] += 1
+            prev_end = cursor = seg.end
+    return stats, cursor
+
+
+def _scan_polygon(poly, step):
+    """Intersect a polygon with the vertical scanlines zigzag_fill would use.
+
+    Returns an (n, 3) array of (scanline index, y bottom, y top) chords,
+    sorted the same way zigzag_fill visits them.
+    """
+    xmin, ymin, xmax, ymax = poly.bounds
+    xs = np.arange(xmin, xmax + step, step)
+    coords = np.empty((len(xs), 2, 2))
+    coords[:, :, 0] = xs[:, None]
+    coords[:, 0, 1] = ymin - 1
+    coords[:, 1, 1] = ymax + 1
+    lines = shapely.linestrings(coords)
+
+    hits = shapely.intersection(lines, poly)
+    parts, line_idx = shapely.get_parts(hits, return_index=True)
+    keep = shapely.length(parts) > 0
+    parts, line_idx = parts[keep], line_idx[keep]
+    if not len(parts):
+        return xs, np.empty((0, 3))
+
+    bounds = shapely.bounds(parts)
+    chords = np.column_stack([line_idx, bounds[:, 1], bounds[:, 3]])
+    chords = chords[np.lexsort((chords[:, 1], chords[:, 0]))]
+
+    # a scanline running along the boundary comes back split at every
+    # vertex, while zigzag_fill sees one chord there
+    starts = np.ones(len(chords), dtype=bool)
+    starts[1:] = (chords[1:, 0] != chords[:-1, 0]) | (chords[1:, 1] > chords[:-1, 2])
+    first = np.flatnonzero(starts)
+    merged = chords[first]
+    merged[:, 2] = np.maximum.reduceat(chords[:, 2], first)
+    return xs, merged
+
+
+def _resample_ring(ring, step, min_pts=25, max_pts=10000):
+    n = int(np.clip(np.ceil(ring.length / step), min_pts, max_pts))
+    distances = np.linspace(0.0, ring.length, n, endpoint=False)
+    return shapely.get_coordinates(shapely.line_interpolate_point(ring, distances))
+
+
+def _resample_polygon(poly, step):
+    """Polygon with every ring resampled the way svgpath_to_shapely_polygon does."""
+    resampled = Polygon(_resample_ring(poly.exterior, step),
+                        [_resample_ring(ring, step) for ring in poly.interiors])
+    return resampled if resampled.is_valid else resampled.buffer(0)
+
+
+def estimate_zigzag_stats(poly, angle, step, cursor=0j, path_buffer=0.1):
+    """Estimate the zigzag_fill output for one slice without building Paths.
+
+    Chords are grouped into strokes the way zigzag_fill groups them: a chord
+    joins the first stroke ending on the previous scanline whose connecting
+    segment is covered by the polygon buffered by `path_buffer`. On
+    gage_portrait the stroke counts land within about 2% of --exact and the
+    draw length within 0.3%; scanlines through a vertex make up the rest.
+    """
+    stats = _empty_stats()
+    minx, miny, maxx, maxy = poly.bounds
+    center = complex((minx + maxx) / 2, (miny + maxy) / 2)
+    rotated = affinity.rotate(poly, angle, origin=(center.real, center.imag))
+
+    xs, chords = _scan_polygon(rotated, step)
+    if not len(chords):
+        return stats, cursor
+
+    # zigzag_fill tests against the outline resampled at the hatch spacing
+    safe_poly = _resample_polygon(rotated, step).buffer(path_buffer)
+    shapely.prepare(safe_poly)
+
+    # each group: [last scanline, last top, start, end]
+    groups = []
+    chord_lines = chords[:, 0].astype(int)
+    for line in np.unique(chord_lines):
+        line_chords = chords[chord_lines == line]
+        x = xs[line]
+
+        open_groups = [grp for grp in groups if grp[0] == line - 1]
+        if open_groups:
+            # every connecting segment of this scanline in one covers call
+            coords = np.empty((len(open_groups), len(line_chords), 2, 2))
+            coords[:, :, 0, 0] = xs[line - 1]
+            coords[:, :, 0, 1] = np.array([grp[1] for grp in open_groups])[:, None]
+            coords[:, :, 1, 0] = x
+            coords[:, :, 1, 1] = line_chords[:, 1]
+            covered = shapely.covers(safe_poly, shapely.linestrings(coords.reshape(-1, 2, 2)))
+            covered = covered.reshape(len(open_groups), len(line_chords))
+
+        for j, (_, y0, y1) in enumerate(line_chords):
+            for i, grp in enumerate(open_groups):
+                if grp[0] == line - 1 and covered[i, j]:
+                    stats["draw_length"] += np.hypot(step, y0 - grp[1])
+                    grp[0], grp[1] = line, y1
+                    grp[3] = complex(x, y1)
+                    break
+            else:
+                groups.append([line, y1, complex(x, y0), complex(x, y1)])
+            stats["draw_length"] += y1 - y0
+            stats["vertices"] += 2
+
+    unrotate = np.exp(-1j * np.radians(angle))
+    for grp in groups:
+        start = (grp[2] - center) * unrotate + center
+        stats["pen_up_travel"] += abs(start - cursor)
+        cursor = (grp[3] - center) * unrotate + center
+    stats["strokes"] = len(groups)
+    return stats, cursor
+
+
+def estimate_hatch_stats(paths, angle, step, slice_height=None, cursor=0j, path_buffer=0.1):
+    """Mirror of paths_to_zigzag_paths that only reports stroke stats."""
+    stats = _empty_stats()
+    for path in paths:
+        xmin, xmax, ymin, ymax = path.bbox()
+
+        if slice_height is None or slice_height <= 0 or slice_height >= (ymax - ymin):
+            bands = [(ymin, ymax)]
+        else:
+            bands = []
+            y = ymin
+            while y < ymax:
+                bands.append((y, min(y + slice_height, ymax)))
+                y += slice_height
+
+        base_poly = svgpath_to_shapely_polygon(path, step).buffer(0)
+        for y0, y1 in bands:
+            slice_poly = base_poly.intersection(box(xmin, y0, xmax, y1))
+            if slice_poly.is_empty:
+                continue
+            slices = ([slice_poly] if isinstance(slice_poly, Polygon) else
+                      [g for g in slice_poly.geoms if isinstance(g, Polygon)])
+            for sp in slices:
+                slice_stats, cursor = estimate_zigzag_stats(sp, angle, step, cursor,
+                                                            path_buffer=path_buffer)
+                _add_stats(stats, slice_stats)
+    return stats, cursor
+
+
+def exact_hatch_stats(paths, angle, step, config, slice_height=None, cursor=0j):
+    zigzags = paths_to_zigzag_paths(paths, angle, step, config, slice_height=slice_height)
+    return measure_paths(zigzags, cursor)
+
+
+def plot_time(stats, config, units_per_inch):
+    draw_in = stats["draw_length"] / units_per_inch
+    travel_in = stats["pen_up_travel"] / units_per_inch
+    return (draw_in / config.get_draw_speed()
+            + travel_in / config.get_travel_speed()
+            + stats["strokes"] * config.get_pen_lift_time())
+
+
+def analyze_value(all_paths, attrs, value, config, units_per_inch, exact=False):
+    paths = filter_paths_by_color(all_paths, attrs, config.get_color(value))
+    geometry = prepare_value_geometry(paths, config, verbose=False)
+    if geometry is None:
+        geometry = ([], [], [], [])
+    paths, small_paths, regular_paths, large_paths = geometry
+
+    report = {
+        "value": str(value),
+        "color": config.get_color(value),
+        "paths": len(paths),
+        "passes": [],
+    }
+    totals = _empty_stats()
+    cursor = 0j
+
+    paths_to_outline = select_paths_to_outline(small_paths, regular_paths, large_paths,
+                                               config, verbose=False)
+
+    for angle, step, slice_height in config.get_hatch_passes(value):
+        # main de-duplicates each group's zigzags separately
+        stats = _empty_stats()
+        for group in get_paths_to_hatch(geometry, config):
+            if exact:
+                group_stats, cursor = exact_hatch_stats(group, angle, step, config,
+                                                        slice_height=slice_height,
+                                                        cursor=cursor)
+            else:
+                group_stats, cursor = estimate_hatch_stats(group, angle, step,
+                                                           slice_height=slice_height,
+                                                           cursor=cursor,
+                                                           path_buffer=config.path_buffer)
+            _add_stats(stats, group_stats)
+        _add_stats(totals, stats)
+        report["passes"].append(
+            {"angle": angle, "spacing": step, "slice_height": slice_height, **stats})
+
+    outline_stats, cursor = measure_paths(paths_to_outline, cursor)
+    _add_stats(totals, outline_stats)
+    report["outlines"] = outline_stats
+
+    report.update(totals)
+    report["estimated_time_s"] = plot_time(totals, config, units_per_inch)
+    return report
+
+
+def analyze(config, exact=False):
+    """Run the geometry for every configured value without writing SVGs.
+
+    Lengths are reported in SVG user units; the time estimate converts them
+    to inches and applies the configured feed rates.
+    """
+    all_paths, attrs, svg_attrs = svg2paths2(config.get_input_path())
+    units_per_inch = _units_per_inch(svg_attrs)
+
+    tones = []
+    totals = _empty_stats()
+    for value in config.get_values_to_process():
+        report = analyze_value(all_paths, attrs, value, config, units_per_inch, exact=exact)
+        _add_stats(totals, report)
+        tones.append(report)
+
+    totals["estimated_time_s"] = plot_time(totals, config, units_per_inch)
+    return {
+        "input": config.get_input_path(),
+        "mode": "exact" if exact else "estimate",
+        "units_per_inch": units_per_inch,
+        "feed_rates": {
+            "draw_speed": config.get_draw_speed(),
+            "travel_speed": config.get_travel_speed(),
+            "pen_lift_time": config.get_pen_lift_time(),
+        },
+        "tones": tones,
+        "totals": totals,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report stroke counts, lengths and plot time without writing SVGs.")
+    parser.add_argument("config")
+    parser.add_argument("--exact", action="store_true",
+                        help="materialize the zigzags instead of estimating them")
+    parser.add_argument("--max-time", type=float, default=None,
+                        help="exit with status 1 if the estimated plot time exceeds this many seconds")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        config = Config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"error: could not load config: {type(e).__name__}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    errors, warnings = config.validate()
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    if errors:
+        for error in errors:
+            print(f"error: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    report = analyze(config, exact=args.exact)
+    report["config"] = args.config
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+    if args.max_time is not None and report["totals"]["estimated_time_s"] > args.max_time:
+        print(f"estimated plot time {report['totals']['estimated_time_s']:.0f}s "
+              f"exceeds --max-time {args.max_time:.0f}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
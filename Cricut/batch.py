@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from svgpathtools import svg2paths2
+from path_utils import filter_paths_by_color
+from main import hatch_value, save_outputs, get_output_paths
+from config import Config
+
+
+class Job:
+
+    def __init__(self, name, config=None, error=None):
+        self.name = name
+        self.config = config
+        self.error = error
+        self.values = list(config.get_values_to_process()) if config else []
+        self.results = {}
+        self.futures = []
+        self.svg_attrs = None
+        self.zigzags = 0
+        self.started = None
+        self.elapsed = None
+        self.finished = False
+
+    def is_done(self):
+        return self.error is None and len(self.results) == len(self.values)
+
+    def submit(self, pool, fn, *args):
+        if self.started is None:
+            self.started = time.perf_counter()
+        future = pool.submit(fn, *args)
+        self.futures.append(future)
+        return future
+
+    def fail(self, exc):
+        if self.error is None:
+            self.error = exc if isinstance(exc, str) else f"{type(exc).__name__}: {exc}"
+            if self.started is not None:
+                self.elapsed = time.perf_counter() - self.started
+            self.results = {}
+            for future in self.futures:
+                future.cancel()
+            print(f"[{self.name}] FAILED: {self.error}")
+
+
+def _load_config(path, output_dir):
+    with open(path) as f:
+        cfg_dict = json.load(f)
+    if output_dir is not None:
+        cfg_dict["svg_output_dir"] = output_dir
+    return Config.from_dict(cfg_dict)
+
+
+def _template_config(template, svg_path, output_dir):
+    cfg_dict = dict(template)
+    cfg_dict["svg_input_dir"] = os.path.dirname(svg_path)
+    cfg_dict["svg_filename"] = os.path.splitext(os.path.basename(svg_path))[0]
+    if output_dir is not None:
+        cfg_dict["svg_output_dir"] = output_dir
+    return Config.from_dict(cfg_dict)
+
+
+def _validated_job(path, config):
+    """A job for `config`, or a FAILED one when the config does not validate."""
+    errors, warnings = config.validate()
+    for warning in warnings:
+        print(f"[{path}] warning: {warning}")
+    if errors:
+        return Job(path, error="; ".join(errors))
+    return Job(path, config)
+
+
+def discover_jobs(inputs, template_path=None, output_dir=None):
+    """Expand config files, SVG files and directories into jobs.
+
+    Directories contribute every .json config and every .svg they contain.
+    SVG inputs are rendered with the config at `template_path`, pointing its
+    svg_input_dir/svg_filename at the SVG.
+    """
+    config_files = []
+    svg_files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.endswith(".json"):
+                    config_files.append(os.path.join(item, name))
+                elif name.endswith(".svg"):
+                    svg_files.append(os.path.join(item, name))
+        elif item.endswith(".svg"):
+            svg_files.append(item)
+        else:
+            config_files.append(item)
+
+    jobs = []
+    for path in config_files:
+        try:
+            jobs.append(_validated_job(path, _load_config(path, output_dir)))
+        except Exception as e:
+            jobs.append(Job(path, error=f"{type(e).__name__}: {e}"))
+
+    if svg_files:
+        if template_path is None:
+            raise ValueError("SVG inputs need a --template config")
+        with open(template_path) as f:
+            template = json.load(f)
+        for path in svg_files:
+            jobs.append(_validated_job(path, _template_config(template, path, output_dir)))
+
+    return jobs
+
+
+def _finish(job):
+    try:
+        results = [(value, job.results[i]) for i, value in enumerate(job.values)
+                   if job.results[i] is not None]
+        os.makedirs(job.config.cfg_dict["svg_output_dir"], exist_ok=True)
+        save_outputs(job.config, job.svg_attrs, results)
+    except Exception as e:
+        job.fail(e)
+        return
+    job.elapsed = time.perf_counter() - job.started
+    job.results = {}
+    job.futures = []
+    job.finished = True
+    print(f"[{job.name}] done: {job.zigzags} zigzags in {job.elapsed:.1f}s")
+
+
+def _fail_output_collisions(jobs):
+    """Fail every job that would overwrite an output file of an earlier job.
+
+    Otherwise whichever job finishes last wins, and the result depends on
+    scheduling.
+    """
+    owners = {}
+    for job in jobs:
+        if job.error is not None:
+            continue
+        output_paths = [os.path.abspath(p) for p in get_output_paths(job.config)]
+        for output_path in output_paths:
+            if output_path in owners:
+                job.fail(f"would overwrite {output_path} written by {owners[output_path]}")
+                break
+        else:
+            for output_path in output_paths:
+                owners[output_path] = job.name
+
+
+def run_batch(jobs, max_workers=None, verbose=False, threads=False):
+    """Run every job on one shared worker pool.
+
+    Each distinct input SVG is parsed once, then every (job, value) pair is
+    queued as its own task, so workers stay busy across job boundaries. A
+    failing task only fails the job it belongs to. With `threads` the pool
+    is a thread pool instead, which avoids pickling paths and scales on
+    free-threaded CPython. Jobs whose output files overlap an earlier job's
+    fail before anything is submitted.
+    """
+    _fail_output_collisions(jobs)
+
+    jobs_by_input = {}
+    for job in jobs:
+        if job.error is None:
+            input_path = os.path.abspath(job.config.get_input_path())
+            jobs_by_input.setdefault(input_path, []).append(job)
+
+    if threads:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    with executor as pool:
+        pending = {}
+        for input_path in jobs_by_input:
+            pending[pool.submit(svg2paths2, input_path)] = ("parse", input_path)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, key = pending.pop(future)
+
+                if kind == "parse":
+                    try:
+                        all_paths, attrs, svg_attrs = future.result()
+                    except Exception as e:
+                        for job in jobs_by_input[key]:
+                            job.fail(e)
+                        continue
+
+                    for job in jobs_by_input[key]:
+                        job.svg_attrs = svg_attrs
+                        try:
+                            for i, value in enumerate(job.values):
+                                paths = filter_paths_by_color(all_paths, attrs,
+                                                              job.config.get_color(value))
+                                task = job.submit(pool, hatch_value, paths, value, job.config,
+                                                  verbose)
+                                pending[task] = ("hatch", (job, i))
+                        except Exception as e:
+                            job.fail(e)
+                            continue
+                        if job.is_done():
+                            job.started = time.perf_counter()
+                            _finish(job)
+                    continue
+
+                job, i = key
+                value = job.values[i]
+                if job.error is not None or future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    job.fail(e)
+                    continue
+
+                job.results[i] = result
+                num_zigzags = len(result[1]) if result is not None else 0
+                job.zigzags += num_zigzags
+                print(f"[{job.name}] value {value}: {num_zigzags} zigzags "
+                      f"({len(job.results)}/{len(job.values)})")
+                if job.is_done():
+                    _finish(job)
+
+    for job in jobs:
+        if job.error is None and not job.finished:
+            job.fail("did not finish")
+
+    return jobs
+
+
+def print_summary(jobs):
+    print(f"{'='*30} BATCH {'='*30}")
+    width = max((len(job.name) for job in jobs), default=0)
+    for job in jobs:
+        elapsed = f"{job.elapsed:.1f}s" if job.elapsed is not None else "-"
+        if job.error is None:
+            print(f"ok      {job.name:<{width}}  {len(job.values)} values, "
+                  f"{job.zigzags} zigzags, {elapsed}")
+        else:
+            print(f"FAILED  {job.name:<{width}}  {job.error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render many configs or SVGs on one shared worker pool.")
+    parser.add_argument("inputs", nargs="+",
+                        help="config .json files, .svg files or directories of either")
+    parser.add_argument("--template", default=None,
+                        help="config used for .svg inputs")
+    parser.add_argument("--output-dir", default=None,
+                        help="override svg_output_dir for every job")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of workers (default: all cores)")
+    parser.add_argument("--threads", action="store_true",
+                        help="use a thread pool instead of worker processes")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="keep the per-polygon output of the workers")
+    args = parser.parse_args()
+
+    jobs = discover_jobs(args.inputs, args.template, args.output_dir)
+    print(f"{len(jobs)} jobs")
+    run_batch(jobs, max_workers=args.workers, verbose=args.verbose, threads=args.threads)
+    print_summary(jobs)
+
+    if any(job.error is not None for job in jobs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
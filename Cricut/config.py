@@ -1,14 +1,39 @@
 import os
 import json
+from numbers import Number
+
+
+def _is_number(value):
+    return isinstance(value, Number) and not isinstance(value, bool)
+
 
 class Config:
 
     def __init__(self, config_filepath):
         with open(config_filepath) as f:
-            self.cfg_dict = json.load(f)
-            self.x_tolerance_epsilon = self.cfg_dict["x_tolerance_epsilon"]
-            self.path_buffer =  self.cfg_dict["path_buffer"]
-            self.overshoot =  self.cfg_dict["overshoot"]
+            self._load(json.load(f))
+
+    @classmethod
+    def from_dict(cls, cfg_dict):
+        config = cls.__new__(cls)
+        config._load(cfg_dict)
+        return config
+
+    def _load(self, cfg_dict):
+        self.cfg_dict = cfg_dict
+
+    # read lazily so that validate() can report them missing
+    @property
+    def x_tolerance_epsilon(self):
+        return self.cfg_dict["x_tolerance_epsilon"]
+
+    @property
+    def path_buffer(self):
+        return self.cfg_dict["path_buffer"]
+
+    @property
+    def overshoot(self):
+        return self.cfg_dict["overshoot"]
 
     def get_save_single_output(self):
         return self.cfg_dict["save_single_output"]
@@ -66,6 +91,131 @@ class Config:
     def get_spacing(self, value):
         return self.cfg_dict["shading_config"][str(value)]["spacing"]
 
+    def get_hatch_passes(self, value):
+        """(angle, spacing, slice_height) triples of a value.
+
+        Passes are paired up index by index, so extra entries in the longer
+        lists are ignored; validate() reports when that happens.
+        """
+        return list(zip(self.get_angles(value),
+                        self.get_spacing(value),
+                        self.get_slice_sizes(value)))
+
+    def validate(self):
+        """Check the config before running it.
+
+        Returns (errors, warnings). Errors would make a run fail or hang,
+        warnings flag settings that are silently ignored.
+        """
+        errors = []
+        warnings = []
+
+        if not isinstance(self.cfg_dict, dict):
+            return ["the config must be a JSON object"], warnings
+
+        for key in ("svg_filename", "svg_input_dir", "svg_output_dir", "values_to_process",
+                    "shading_config", "save_single_output", "save_with_color",
+                    "max_polygon_area", "min_polygon_area", "slice_large_polygons",
+                    "outline_small_polygons", "outline_regular_polygons",
+                    "outline_large_polygons", "x_tolerance_epsilon", "path_buffer",
+                    "overshoot"):
+            if key not in self.cfg_dict:
+                errors.append(f"missing key '{key}'")
+        if errors:
+            return errors, warnings
+
+        for key in ("x_tolerance_epsilon", "path_buffer", "overshoot"):
+            if not _is_number(self.cfg_dict[key]):
+                errors.append(f"'{key}' must be a number, got {self.cfg_dict[key]!r}")
+        for key in ("max_polygon_area", "min_polygon_area"):
+            if self.cfg_dict[key] is not None and not _is_number(self.cfg_dict[key]):
+                errors.append(f"'{key}' must be a number or null, got {self.cfg_dict[key]!r}")
+        if not isinstance(self.cfg_dict["values_to_process"], list):
+            errors.append("'values_to_process' must be a list")
+        if not isinstance(self.cfg_dict["shading_config"], dict):
+            errors.append("'shading_config' must be an object")
+        if errors:
+            return errors, warnings
+
+        if not os.path.exists(self.get_input_path()):
+            errors.append(f"input SVG {self.get_input_path()} does not exist")
+
+        for value in self.get_values_to_process():
+            shading = self.cfg_dict["shading_config"].get(str(value))
+            if shading is None:
+                errors.append(f"value {value} is not in shading_config")
+                continue
+            if not isinstance(shading, dict):
+                errors.append(f"value {value}: shading entry must be an object")
+                continue
+            missing = [key for key in ("color", "angles", "spacing", "slice_heights")
+                       if key not in shading]
+            if missing:
+                errors.append(f"value {value} is missing {', '.join(missing)}")
+                continue
+
+            bad = False
+            for key in ("angles", "spacing", "slice_heights"):
+                entries = shading[key]
+                if not isinstance(entries, list):
+                    errors.append(f"value {value}: {key} must be a list, got {entries!r}")
+                    bad = True
+                # a slice height of null means no slicing, like 0
+                elif not all(_is_number(e) or (key == "slice_heights" and e is None)
+                             for e in entries):
+                    errors.append(f"value {value}: {key} must only contain numbers, "
+                                  f"got {entries!r}")
+                    bad = True
+            if bad:
+                continue
+
+            lengths = {key: len(shading[key]) for key in ("angles", "spacing", "slice_heights")}
+            if len(set(lengths.values())) > 1:
+                warnings.append(
+                    f"value {value}: angles, spacing and slice_heights have "
+                    f"{lengths['angles']}, {lengths['spacing']} and {lengths['slice_heights']} "
+                    f"entries, the entries past the first {min(lengths.values())} are ignored")
+            for _, step, _ in self.get_hatch_passes(value):
+                if step <= 0:
+                    errors.append(f"value {value}: spacing must be positive, got {step}")
+
+        return errors, warnings
+
+        if not os.path.exists(self.get_input_path()):
+            errors.append(f"input SVG {self.get_input_path()} does not exist")
+
+        for value in self.get_values_to_process():
+            if str(value) not in self.cfg_dict["shading_config"]:
+                errors.append(f"value {value} is not in shading_config")
+                continue
+            shading = self.cfg_dict["shading_config"][str(value)]
+            missing = [key for key in ("color", "angles", "spacing", "slice_heights")
+                       if key not in shading]
+            if missing:
+                errors.append(f"value {value} is missing {', '.join(missing)}")
+                continue
+
+            lengths = {key: len(shading[key]) for key in ("angles", "spacing", "slice_heights")}
+            if len(set(lengths.values())) > 1:
+                warnings.append(
+                    f"value {value}: angles, spacing and slice_heights have "
+                    f"{lengths['angles']}, {lengths['spacing']} and {lengths['slice_heights']} "
+                    f"entries, the entries past the first {min(lengths.values())} are ignored")
+            for _, step, _ in self.get_hatch_passes(value):
+                if step <= 0:
+                    errors.append(f"value {value}: spacing must be positive, got {step}")
+
+        return errors, warnings
+
+    def get_draw_speed(self):
+        return self.cfg_dict.get("draw_speed", 4.0)
+
+    def get_travel_speed(self):
+        return self.cfg_dict.get("travel_speed", 8.0)
+
+    def get_pen_lift_time(self):
+        return self.cfg_dict.get("pen_lift_time", 0.1)
+
     def get_all_values(self):
         return self.cfg_dict["shading_config"].keys()
 
@@ -0,0 +1,89 @@
+"""Side-effect-free hatching API.
+
+Nothing here reads a Config, prints or touches module state, so `hatch` can
+be called from several threads at once. `hatch_many` runs a list of hatch
+jobs on a thread pool: on free-threaded CPython every worker runs in
+parallel, and elsewhere the GEOS calls inside shapely 2 still release the
+GIL. Threads also skip pickling the geometry, unlike a process pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from shapely.geometry.base import BaseGeometry
+from path_utils import hatch_path, remove_duplicate_paths, shapely_to_svgpathtools_path
+
+
+@dataclass(frozen=True)
+class HatchParams:
+    angle: float = 0
+    spacing: float = 3
+    slice_height: float | None = None
+    overshoot: float = 10
+    path_buffer: float = 0.1
+    x_tolerance_epsilon: float = 1e-2
+
+    @classmethod
+    def from_config(cls, config, value):
+        """One HatchParams per (angle, spacing, slice_height) pass of a value."""
+        return [
+            cls(angle=angle,
+                spacing=step,
+                slice_height=slice_height,
+                overshoot=config.overshoot,
+                path_buffer=config.path_buffer,
+                x_tolerance_epsilon=config.x_tolerance_epsilon)
+            for angle, step, slice_height in config.get_hatch_passes(value)
+        ]
+
+
+def _as_path(geometry):
+    if isinstance(geometry, BaseGeometry):
+        return shapely_to_svgpathtools_path(geometry)
+    return geometry
+
+
+def _hatch_one(params, geometry):
+    return hatch_path(_as_path(geometry),
+                      params.angle,
+                      params.spacing,
+                      params.slice_height,
+                      overshoot=params.overshoot,
+                      path_buffer=params.path_buffer,
+                      x_tolerance_epsilon=params.x_tolerance_epsilon)
+
+
+def hatch(geometries, params, executor=None):
+    """Hatch svgpathtools Paths or shapely polygons into zigzag strokes.
+
+    Returns a list of svgpathtools Paths with duplicates removed. With an
+    `executor`, the geometries are hatched concurrently on it.
+    """
+    if executor is None:
+        results = map(partial(_hatch_one, params), geometries)
+    else:
+        results = executor.map(partial(_hatch_one, params), geometries)
+
+    strokes = []
+    for result in results:
+        strokes.extend(result)
+    return remove_duplicate_paths(strokes)
+
+
+def hatch_many(jobs, max_workers=None):
+    """Run several (geometries, params) jobs on one thread pool.
+
+    Each geometry of each job is its own task, so a job with one huge
+    polygon does not hold back the others. Results come back in job order.
+    """
+    jobs = [(list(geometries), params) for geometries, params in jobs]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [[pool.submit(_hatch_one, params, geometry) for geometry in geometries]
+                   for geometries, params in jobs]
+
+        results = []
+        for job_futures in futures:
+            strokes = []
+            for future in job_futures:
+                strokes.extend(future.result())
+            results.append(remove_duplicate_paths(strokes))
+    return results
@@ -12,102 +12,175 @@ from path_utils import (
 from config import Config
 
 
-def main():
-    cfg_filename = sys.argv[1]
-    config = Config(cfg_filename)
-    config.print_config()
+def classify_paths_by_area(paths, config, verbose=True, areas=None):
+    max_area = config.get_max_area()
+    min_area = config.get_min_area()
+
+    regular_paths = []
+    small_paths = []
+    large_paths = []
+
+    if areas is None:
+        areas = [svgpath_to_shapely_polygon(path).area for path in paths]
+
+    for path, area in zip(paths, areas):
+        if min_area and area < min_area:
+            if verbose:
+                print("skipping polygon - below configured min polygon area.")
+            small_paths.append(path)
+        elif max_area and area > max_area:
+            if verbose:
+                print("skipping polygon - above configured max polygon area.")
+            large_paths.append(path)
+        else:
+            regular_paths.append(path)
+
+    return small_paths, regular_paths, large_paths
+
+
+def select_paths_to_outline(small_paths, regular_paths, large_paths, config, verbose=True):
+    paths_to_outline = []
+
+    if config.get_outline_small_polygons():
+        if verbose:
+            print("outlining too small polygons")
+        paths_to_outline.extend(small_paths)
+    if (config.get_outline_regular_polygons()):
+        if verbose:
+            print("outlining regular polygons")
+        paths_to_outline.extend(regular_paths)
+    if config.get_outline_large_polygons():
+        if verbose:
+            print("outlining too large polygons")
+        paths_to_outline.extend(large_paths)
+
+    return paths_to_outline
+
+
+def prepare_value_geometry(paths, config, verbose=True, cache=None):
+    """Merge the colour-filtered paths of a value and split them by area.
+
+    Returns (merged_paths, small_paths, regular_paths, large_paths), or None
+    when nothing is left after merging. A `cache` (see serve.PathCache)
+    supplies the per-path polygons and areas instead of resampling them.
+    """
+    polygons = None if cache is None else [cache.polygon(path) for path in paths]
+    paths = merge_outer_and_hole_paths(paths, polygons=polygons)
+
+    if (not paths):
+        return None
+
+    areas = None if cache is None else [cache.area(path) for path in paths]
+    return (paths,) + classify_paths_by_area(paths, config, verbose, areas=areas)
+
+
+def get_paths_to_hatch(geometry, config):
+    """The groups of paths a hatch pass fills, in output order."""
+    _, _, regular_paths, large_paths = geometry
+    groups = [regular_paths]
+    if (config.get_slice_large_polygons()):
+        groups.append(large_paths)
+    return groups
+
+
+def hatch_value_pass(geometry, angle, step, slice_height, config, verbose=True, cache=None):
+    """Zigzags of one (angle, spacing, slice_height) pass over a geometry."""
+    zigzags = []
+    for group in get_paths_to_hatch(geometry, config):
+        if cache is None:
+            zigzags.extend(paths_to_zigzag_paths(
+                                group,
+                                angle,
+                                step,
+                                config,
+                                slice_height=slice_height,
+                            ))
+        else:
+            strokes = []
+            for path in group:
+                strokes.extend(cache.hatch(path, angle, step, slice_height, config))
+            zigzags.extend(cache.remove_duplicates(strokes))
+
+    if verbose:
+        print(f"zigzags: {len(zigzags)}")
+    return zigzags
+
+
+def collect_value(geometry, zigzags, config, verbose=True):
+    """Pair a value's hatch passes with its outlines for save_outputs."""
+    paths, small_paths, regular_paths, large_paths = geometry
+    paths_to_outline = select_paths_to_outline(small_paths, regular_paths, large_paths,
+                                               config, verbose)
+    return paths, zigzags, paths_to_outline
+
+
+def hatch_value(paths, value, config, verbose=True):
+    """Merge, classify and hatch the paths of a single value.
+
+    `paths` are the input paths already filtered to the value's colour.
+    Returns (merged_paths, zigzags, paths_to_outline), or None when nothing
+    is left to hatch after merging.
+    """
+    geometry = prepare_value_geometry(paths, config, verbose)
+
+    if geometry is None:
+        return None
 
-    all_paths, attrs, svg_attrs = svg2paths2(os.path.join(config.get_input_path()))
-    
     zigzags_for_value = []
+    for angle, step, slice_height in config.get_hatch_passes(value):
+        zigzags_for_value.extend(
+            hatch_value_pass(geometry, angle, step, slice_height, config, verbose))
 
-    for value in config.get_values_to_process():
-        if not config.get_save_single_output():
-            zigzags_for_value = []
+    return collect_value(geometry, zigzags_for_value, config, verbose)
 
-        angles = config.get_angles(value)
-        spacing = config.get_spacing(value)
-        slice_flags = config.get_slice_sizes(value)
-        paths = filter_paths_by_color(all_paths, attrs, config.get_color(value))
-        print(f"There are {len(paths)} paths for value: {value}")          
 
-        paths = merge_outer_and_hole_paths(paths)
-        
-        if (not paths): 
-            print(f"no paths for value {value}. Continuing...")
-            continue
+def get_output_paths(config):
+    """Every file save_outputs may write for a config."""
+    output_paths = [config.get_output_path(extension="_outlines")]
+    if config.get_save_single_output():
+        output_paths.append(
+            config.get_output_path(extension=(str(config.get_values_to_process()))))
+    else:
+        for value in config.get_values_to_process():
+            output_paths.append(config.get_output_path(extension=f"[{value}]"))
+    return output_paths
+
 
+def save_outputs(config, svg_attrs, results):
+    """Write the SVGs for a list of (value, hatch_value result) pairs.
+
+    With save_single_output every value's zigzags go into one file along
+    with the outlines of the last value, otherwise one file per value.
+    """
+    zigzags_for_value = []
+    paths_to_outline = []
+
+    # every value shares the _outlines file, so only the last one survives
+    if results:
+        _, (last_paths, _, _) = results[-1]
         save_paths(
-            paths,
+            last_paths,
             config.get_output_path(extension="_outlines"),
             svg_attrs,
             with_border=True,
             with_color=config.get_save_with_color()
         )
 
-        max_area = config.get_max_area()
-        min_area = config.get_min_area() 
-
-        regular_paths = []
-        small_paths = []
-        large_paths = []
-        paths_to_outline = []
-
-        for path in paths: 
-            poly = svgpath_to_shapely_polygon(path)
-                    
-            if min_area and poly.area < min_area: 
-                print("skipping polygon - below configured min polygon area.")
-                small_paths.append(path)
-            elif max_area and poly.area > max_area:
-                print("skipping polygon - above configured max polygon area.")
-                large_paths.append(path)   
-            else: 
-                regular_paths.append(path)
-        
-        if config.get_outline_small_polygons(): 
-            print("outlining too small polygons")        
-            paths_to_outline.extend(small_paths)
-        if (config.get_outline_regular_polygons()):
-            print("outlining regular polygons")
-            paths_to_outline.extend(regular_paths)
-        if config.get_outline_large_polygons():
-            print("outlining too large polygons")     
-            paths_to_outline.extend(large_paths)
-        
-        for angle, step, slice_height in zip(angles, spacing, slice_flags):
-            zigzags = paths_to_zigzag_paths(
-                            regular_paths, 
-                            angle, 
-                            step, 
-                            config,
-                            slice_height=slice_height, 
-                        )
-            
-            if (config.get_slice_large_polygons()):
-                zigzags.extend(paths_to_zigzag_paths(
-                                    large_paths, 
-                                    angle, 
-                                    step, 
-                                    config, 
-                                    slice_height=slice_height,
-                                ))
-                
-            print(f"zigzags: {len(zigzags)}")
-            zigzags_for_value.extend(zigzags)
-
+    for value, (_, zigzags, paths_to_outline) in results:
         if not config.get_save_single_output():
             save_paths(
-                remove_duplicate_paths(zigzags_for_value) + paths_to_outline,
+                remove_duplicate_paths(zigzags) + paths_to_outline,
                 config.get_output_path(extension=f"[{value}]"),
                 svg_attrs,
                 with_border=True,
                 with_color=config.get_save_with_color()
             )
+        else:
+            zigzags_for_value.extend(zigzags)
 
     if config.get_save_single_output():
         all_combined = remove_duplicate_paths(zigzags_for_value)
-        
+
         save_paths(
             all_combined + paths_to_outline,
             config.get_output_path(extension=(str(config.get_values_to_process()))),
@@ -116,5 +189,42 @@ def main():
             with_color=config.get_save_with_color()
         )
 
+
+def main():
+    cfg_filename = sys.argv[1]
+    try:
+        config = Config(cfg_filename)
+    except (OSError, ValueError) as e:
+        print(f"error: could not load config: {type(e).__name__}: {e}")
+        sys.exit(1)
+
+    errors, warnings = config.validate()
+    if errors:
+        for error in errors:
+            print(f"error: {error}")
+        sys.exit(1)
+
+    config.print_config()
+    for warning in warnings:
+        print(f"warning: {warning}")
+
+    all_paths, attrs, svg_attrs = svg2paths2(os.path.join(config.get_input_path()))
+
+    results = []
+
+    for value in config.get_values_to_process():
+        paths = filter_paths_by_color(all_paths, attrs, config.get_color(value))
+        print(f"There are {len(paths)} paths for value: {value}")
+
+        result = hatch_value(paths, value, config)
+
+        if result is None:
+            print(f"no paths for value {value}. Continuing...")
+            continue
+
+        results.append((value, result))
+
+    save_outputs(config, svg_attrs, results)
+
 if __name__ == "__main__":
     main()
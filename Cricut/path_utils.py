@@ -1,10 +1,12 @@
 import random
-from shapely.ops import unary_union
 import math
+import bisect
+import itertools
 import numpy as np
+import shapely
 from shapely.prepared import prep
 from shapely.geometry import box, LineString, Polygon, GeometryCollection, MultiPolygon
-from svgpathtools import Line, Path, wsvg
+from svgpathtools import Line, Path, QuadraticBezier, CubicBezier, wsvg
 from shapely.strtree import STRtree
 from numbers import Integral
 
@@ -39,6 +41,28 @@ def remove_duplicate_paths(paths):
     return unique
 
 
+def _points_at(segments, lengths, ts):
+    """Path.point for each of `ts`, bisecting the cumulative segment lengths.
+
+    Path.point scans the segments from the start for every point, which is
+    quadratic when sampling a long compound path.
+    """
+    total = sum(lengths)
+    if total == 0:
+        return [segments[0].start for _ in ts]
+    ends = list(itertools.accumulate(l / total for l in lengths))
+
+    pts = []
+    for t in ts:
+        if t == 0.0:
+            pts.append(segments[0].point(t))
+            continue
+        i = min(bisect.bisect_left(ends, t), len(ends) - 1)
+        start = ends[i - 1] if i else 0
+        pts.append(segments[i].point((t - start) / (ends[i] - start)))
+    return pts
+
+
 def svgpath_to_shapely_polygon(path, step=1.5, min_pts=25, max_pts=10000):
     subpaths = []
     current_segs = []
@@ -56,10 +80,11 @@ def svgpath_to_shapely_polygon(path, step=1.5, min_pts=25, max_pts=10000):
         subpaths.append(Path(*current_segs))
 
     def sample(subpath):
-        L = max(subpath.length(error=1e-3), 1e-9)
+        lengths = [seg.length(error=1e-3) for seg in subpath]
+        L = max(sum(lengths), 1e-9)
         n = int(np.clip(math.ceil(L / step), min_pts, max_pts))
         ts = np.linspace(0.0, 1.0, n, endpoint=False)
-        pts = [subpath.point(t) for t in ts]
+        pts = _points_at(list(subpath), lengths, ts)
         pts.append(subpath.point(1.0))
         coords = [(pt.real, pt.imag) for pt in pts]
         poly = Polygon(coords)
@@ -78,40 +103,92 @@ def svgpath_to_shapely_polygon(path, step=1.5, min_pts=25, max_pts=10000):
     if not polys:
         return Polygon()
 
-    # Even-odd
-    filled = polys[0]
-    for p in polys[1:]:
-        filled = filled.symmetric_difference(p)
+    if len(polys) == 1:
+        return polys[0]
+
+    filled = _even_odd_polygon(polys)
     if not filled.is_empty:
         return filled
+    return polys[0]
 
-    parents = {i: None for i in range(len(polys))}
-    for i, pi in enumerate(polys):
-        for j, pj in enumerate(polys):
-            if i == j:
+
+def _fold_symmetric_difference(geoms):
+    filled = geoms[0]
+    for g in geoms[1:]:
+        filled = filled.symmetric_difference(g)
+    return filled
+
+
+def _assemble_nested_rings(rings):
+    """Build the even-odd fill of rings whose boundaries never meet.
+
+    Every ring is classified by how many other rings contain it, using a
+    single STRtree query: rings at even depth are shells, rings at odd
+    depth are holes of the enclosing ring one level up. Returns None if a
+    hole has no enclosing ring.
+    """
+    if not rings:
+        return Polygon()
+
+    # a vertex lies on its own ring, so it is never "within" it
+    probes = shapely.points([ring.exterior.coords[0] for ring in rings])
+    probe_idx, ring_idx = STRtree(rings).query(probes, predicate="within")
+    depth = np.bincount(probe_idx, minlength=len(rings))
+
+    parent = np.full(len(rings), -1)
+    direct = depth[ring_idx] == depth[probe_idx] - 1
+    parent[probe_idx[direct]] = ring_idx[direct]
+
+    is_hole = depth % 2 == 1
+    if (parent[is_hole] < 0).any():
+        return None
+
+    holes = {i: [] for i in np.flatnonzero(~is_hole)}
+    for i in np.flatnonzero(is_hole):
+        holes[parent[i]].append(rings[i].exterior)
+
+    shells = [Polygon(rings[i].exterior, hole_rings) for i, hole_rings in holes.items()]
+    filled = shells[0] if len(shells) == 1 else MultiPolygon(shells)
+    if not filled.is_valid:
+        filled = filled.buffer(0)
+    return filled
+
+
+def _even_odd_polygon(polys):
+    """Assemble subpath polygons under the even-odd rule.
+
+    Rings whose boundaries touch or cross another ring, e.g. a sampled hole
+    poking through its shell, cannot be classified by containment depth.
+    They are combined with symmetric_difference among themselves and
+    folded into the rest once, while every cleanly nested ring goes through
+    _assemble_nested_rings.
+
+    The area matches the plain symmetric_difference fold, but ring start
+    points and orientation differ from what the fold's overlays produced,
+    so zigzags hatched from the result differ from the fold's.
+    """
+    rings = []
+    for poly in polys:
+        for part in getattr(poly, "geoms", [poly]):
+            if not isinstance(part, Polygon) or part.is_empty:
                 continue
-            if pj.contains(pi):
-                if parents[i] is None or pj.area < polys[parents[i]].area:
-                    parents[i] = j
+            rings.append(Polygon(part.exterior))
+            rings.extend(Polygon(interior) for interior in part.interiors)
 
-    outer_idxs = [i for i, parent in parents.items() if parent is None]
-    result_polys = []
-    for outer in outer_idxs:
-        hole_idxs = [i for i, parent in parents.items() if parent == outer]
-        holes = []
-        for hi in hole_idxs:
-            if polys[hi].exterior is not None:
-                holes.append(list(polys[hi].exterior.coords))
-        newpoly = Polygon(list(polys[outer].exterior.coords), holes=holes)
-        if not newpoly.is_valid:
-            newpoly = newpoly.buffer(0)
-        result_polys.append(newpoly)
-
-    if not result_polys:
-        return polys[0]
-    if len(result_polys) == 1:
-        return result_polys[0]
-    return unary_union(result_polys)
+    boundaries = shapely.get_exterior_ring(np.array(rings, dtype=object))
+    left, right = STRtree(boundaries).query(boundaries, predicate="intersects")
+    meets = np.zeros(len(rings), dtype=bool)
+    meets[left[left != right]] = True
+
+    nested = [ring for ring, m in zip(rings, meets) if not m]
+    filled = _assemble_nested_rings(nested)
+    if filled is None:
+        return _fold_symmetric_difference(rings)
+
+    ambiguous = [ring for ring, m in zip(rings, meets) if m]
+    if ambiguous:
+        filled = filled.symmetric_difference(_fold_symmetric_difference(ambiguous))
+    return filled
 
 
 def shapely_to_svgpathtools_path(poly):
@@ -189,13 +266,16 @@ def merge_outer_and_hole_paths(paths,
                                *,
                                sampling_step=1.5,
                                min_pts=25,
-                               max_pts=10000):
+                               max_pts=10000,
+                               polygons=None):
+    # polygons: already sampled svgpath_to_shapely_polygon results for paths
+    if polygons is None:
+        polygons = [svgpath_to_shapely_polygon(p,
+                                               step=sampling_step,
+                                               min_pts=min_pts,
+                                               max_pts=max_pts) for p in paths]
     polys = []
-    for p in paths:
-        poly = svgpath_to_shapely_polygon(p,
-                                          step=sampling_step,
-                                          min_pts=min_pts,
-                                          max_pts=max_pts)
+    for p, poly in zip(paths, polygons):
         if not poly.is_valid:
             poly = poly.buffer(0)
         if poly.is_empty:
@@ -302,23 +382,21 @@ def zigzag_fill(path,
     prepared_safe = prep(safe_poly)
     groups = []
 
-    segment_bounds = []
-    for seg in path:
-        if hasattr(seg, "start") and hasattr(seg, "end"):
-            y_coords = [seg.start.imag, seg.end.imag]
-            ymin_seg, ymax_seg = min(y_coords), max(y_coords)
-            segment_bounds.append((seg, ymin_seg, ymax_seg))
-        else:
-            segment_bounds.append((seg, -1e9, 1e9)) 
+    # x extent of each segment's control points; a scanline outside it
+    # cannot hit the segment, so only the segments it crosses are intersected
+    segments = [seg for seg in path if seg.start != seg.end]
+    seg_xmin = np.full(len(segments), -np.inf)
+    seg_xmax = np.full(len(segments), np.inf)
+    for i, seg in enumerate(segments):
+        if isinstance(seg, (Line, QuadraticBezier, CubicBezier)):
+            xs_seg = [p.real for p in seg.bpoints()]
+            seg_xmin[i], seg_xmax[i] = min(xs_seg), max(xs_seg)
 
     def intersect_with(line):
         hits = []
-        x_coord = line.start.real 
-        for seg, ymin_seg, ymax_seg in segment_bounds:
-
-            if seg.start == seg.end:
-                continue
-
+        x_coord = line.start.real
+        for i in np.flatnonzero((seg_xmin <= x_coord) & (seg_xmax >= x_coord)):
+            seg = segments[i]
             for t, _ in seg.intersect(line):
                 hits.append(seg.point(t))
         hits.sort(key=lambda p: p.imag)
@@ -522,57 +600,73 @@ def sort_paths_by_proximity(paths):
     return sorted_paths
 
 
+def hatch_path(path,
+               angle,
+               step,
+               slice_height=None,
+               *,
+               overshoot=10,
+               path_buffer=0.1,
+               x_tolerance_epsilon=1e-2):
+    new_paths = []
+    xmin, xmax, ymin, ymax = path.bbox()
+
+    if slice_height is None or slice_height <= 0 or slice_height >= (ymax -
+                                                                     ymin):
+        bands = [(ymin, ymax)]  # one single band (no slicing)
+    else:
+        bands = []
+        y = ymin
+        while y < ymax:
+            bands.append((y, min(y + slice_height, ymax)))
+            y += slice_height
+
+    base_poly = svgpath_to_shapely_polygon(path, step)
+    for y0, y1 in bands:
+        band = box(xmin, y0, xmax, y1)
+
+        try:
+            poly0 = base_poly.buffer(0)
+            slice_poly = poly0.intersection(band)
+        except:
+            slice_poly = base_poly.buffer(0).intersection(band)
+        if slice_poly.is_empty:
+            continue
+        slices = ([slice_poly] if isinstance(slice_poly, Polygon) else
+                  list(slice_poly.geoms))
+        for sp in slices:
+            slice_path = shapely_to_svgpathtools_path(sp)
+            sxmin, sxmax, symin, symax = slice_path.bbox()
+            slice_center = complex((sxmin + sxmax) / 2,
+                                   (symin + symax) / 2)
+            rotated = slice_path.rotated(angle, origin=slice_center)
+            zigzags_reg = zigzag_fill(path=rotated,
+                                        step=step,
+                                        overshoot=overshoot,
+                                        path_buf=path_buffer,
+                                        x_tolerance_epsilon=x_tolerance_epsilon)
+
+            if zigzags_reg:
+                for z in zigzags_reg:
+                    new_paths.append(z.rotated(-angle,
+                                               origin=slice_center))
+    return new_paths
+
+
 def paths_to_zigzag_paths(paths, angle, step, config, slice_height=None):
     new_paths = []
      
     if not paths: 
         return []
-    
-    global global_xmin
-    global_xmin = min(p.bbox()[0] for p in paths)
 
     for path in paths:
-        xmin, xmax, ymin, ymax = path.bbox()
-
-        if slice_height is None or slice_height <= 0 or slice_height >= (ymax -
-                                                                         ymin):
-            bands = [(ymin, ymax)]  # one single band (no slicing)
-        else:
-            bands = []
-            y = ymin
-            while y < ymax:
-                bands.append((y, min(y + slice_height, ymax)))
-                y += slice_height
-
-        base_poly = svgpath_to_shapely_polygon(path, step)
-        for y0, y1 in bands:
-            band = box(xmin, y0, xmax, y1)
-
-            try:
-                poly0 = base_poly.buffer(0)
-                slice_poly = poly0.intersection(band)
-            except:
-                slice_poly = base_poly.buffer(0).intersection(band)
-            if slice_poly.is_empty:
-                continue
-            slices = ([slice_poly] if isinstance(slice_poly, Polygon) else
-                      list(slice_poly.geoms))
-            for sp in slices:
-                slice_path = shapely_to_svgpathtools_path(sp)
-                sxmin, sxmax, symin, symax = slice_path.bbox()
-                slice_center = complex((sxmin + sxmax) / 2,
-                                       (symin + symax) / 2)
-                rotated = slice_path.rotated(angle, origin=slice_center)
-                zigzags_reg = zigzag_fill(path=rotated,
-                                            step=step,
-                                            overshoot=config.overshoot,
-                                            path_buf=config.path_buffer,
-                                            x_tolerance_epsilon=config.x_tolerance_epsilon)
-
-                if zigzags_reg:
-                    for z in zigzags_reg:
-                        new_paths.append(z.rotated(-angle,
-                                                   origin=slice_center))
+        new_paths.extend(hatch_path(path,
+                                    angle,
+                                    step,
+                                    slice_height,
+                                    overshoot=config.overshoot,
+                                    path_buffer=config.path_buffer,
+                                    x_tolerance_epsilon=config.x_tolerance_epsilon))
     new_paths = remove_duplicate_paths(new_paths)
 
     return new_paths
@@ -0,0 +1,281 @@
+import os
+import sys
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from svgpathtools import svg2paths2
+from path_utils import filter_paths_by_color
+from main import prepare_value_geometry, hatch_value_pass, collect_value, save_outputs
+from config import Config
+
+# rough per-unit costs measured on gage_portrait.svg, only used for ordering
+# tasks and projecting runtimes
+GEOMETRY_SECONDS_PER_UNIT_PERIMETER = 3e-5
+GEOMETRY_SECONDS_PER_UNIT_AREA = 2e-6
+HATCH_SECONDS_PER_UNIT_LENGTH = 3.5e-5
+HATCH_SECONDS_PER_PATH = 5e-3
+
+
+def _outline_size(paths):
+    """Perimeter and area of paths from their segment endpoints alone."""
+    perimeter = 0.0
+    area = 0.0
+    for path in paths:
+        if not len(path):
+            continue
+        starts = np.array([seg.start for seg in path])
+        ends = np.array([seg.end for seg in path])
+        perimeter += np.abs(ends - starts).sum()
+        nxt = np.roll(starts, -1)
+        area += abs(np.sum(starts.real * nxt.imag - nxt.real * starts.imag)) / 2
+    return perimeter, area
+
+
+class GeometryTask:
+    """Flatten, merge and area-classify the paths of one colour."""
+
+    def __init__(self, key, paths, config):
+        self.key = key
+        self.color = key[1]
+        self.paths = paths
+        self.config = config
+        self.perimeter, self.area = _outline_size(paths)
+        self.cost = (GEOMETRY_SECONDS_PER_UNIT_PERIMETER * self.perimeter
+                     + GEOMETRY_SECONDS_PER_UNIT_AREA * self.area)
+        self.hatches = []
+        self.uses = []
+
+    def priority(self):
+        return self.cost + max((h.cost for h in self.hatches), default=0)
+
+
+class HatchTask:
+    """One (angle, spacing, slice_height) pass over a merged colour."""
+
+    def __init__(self, key, geometry, angle, spacing, slice_height, config):
+        self.key = key
+        self.geometry = geometry
+        self.angle = angle
+        self.spacing = spacing
+        self.slice_height = slice_height
+        self.config = config
+        self.cost = (HATCH_SECONDS_PER_UNIT_LENGTH * geometry.area / spacing
+                     + HATCH_SECONDS_PER_PATH * len(geometry.paths))
+        self.uses = []
+
+
+class JobPlan:
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.errors = []
+        self.warnings = []
+        self.svg_attrs = None
+        self.values = []
+
+
+class Plan:
+
+    def __init__(self):
+        self.jobs = []
+        self.geometry = {}
+        self.hatches = {}
+
+    def has_errors(self):
+        return any(job.errors for job in self.jobs)
+
+    def ordered_geometry(self):
+        """Geometry tasks with the longest chain of dependent work first."""
+        return sorted(self.geometry.values(), key=lambda g: g.priority(), reverse=True)
+
+    def projected_runtime(self, workers=1):
+        total = (sum(g.cost for g in self.geometry.values())
+                 + sum(h.cost for h in self.hatches.values()))
+        longest_chain = max((g.priority() for g in self.geometry.values()), default=0)
+        return max(total / workers, longest_chain)
+
+
+def build_plan(configs):
+    """Validate (name, Config) pairs and expand them into unique tasks.
+
+    Each input SVG is parsed once. Values that share a colour share one
+    geometry task, and passes with the same colour and hatch parameters
+    share one hatch task, across values and across configs.
+    """
+    plan = Plan()
+    svgs = {}
+
+    for name, config in configs:
+        job = JobPlan(name, config)
+        plan.jobs.append(job)
+        job.errors, job.warnings = config.validate()
+        if job.errors:
+            continue
+
+        input_path = os.path.abspath(config.get_input_path())
+        if input_path not in svgs:
+            svgs[input_path] = svg2paths2(input_path)
+        all_paths, attrs, job.svg_attrs = svgs[input_path]
+
+        for value in config.get_values_to_process():
+            color = config.get_color(value)
+            geometry_key = (input_path, color, config.get_min_area(), config.get_max_area())
+            geometry = plan.geometry.get(geometry_key)
+            if geometry is None:
+                paths = filter_paths_by_color(all_paths, attrs, color)
+                if not paths:
+                    job.warnings.append(f"value {value}: no paths with colour {color}")
+                    job.values.append((value, None, []))
+                    continue
+                geometry = GeometryTask(geometry_key, paths, config)
+                plan.geometry[geometry_key] = geometry
+            geometry.uses.append((name, value))
+
+            hatches = []
+            for angle, step, slice_height in config.get_hatch_passes(value):
+                hatch_key = geometry_key + (angle, step, slice_height, config.overshoot,
+                                            config.path_buffer, config.x_tolerance_epsilon,
+                                            config.get_slice_large_polygons())
+                hatch = plan.hatches.get(hatch_key)
+                if hatch is None:
+                    hatch = HatchTask(hatch_key, geometry, angle, step, slice_height, config)
+                    plan.hatches[hatch_key] = hatch
+                    geometry.hatches.append(hatch)
+                hatch.uses.append((name, value))
+                hatches.append(hatch)
+
+            job.values.append((value, geometry, hatches))
+
+    return plan
+
+
+def _format_uses(uses, multiple_jobs):
+    if multiple_jobs:
+        return ", ".join(f"{name}:{value}" for name, value in uses)
+    return ", ".join(str(value) for _, value in uses)
+
+
+def print_plan(plan, workers=1):
+    print(f"{'='*30} PLAN {'='*30}")
+    for job in plan.jobs:
+        print(job.name)
+        for error in job.errors:
+            print(f"  error: {error}")
+        for warning in job.warnings:
+            print(f"  warning: {warning}")
+
+    multiple_jobs = len(plan.jobs) > 1
+    for geometry in plan.ordered_geometry():
+        print(f"geometry {geometry.color}: {len(geometry.paths)} paths, "
+              f"area {geometry.area:.0f}, est {geometry.cost:.1f}s "
+              f"(values {_format_uses(geometry.uses, multiple_jobs)})")
+        for hatch in sorted(geometry.hatches, key=lambda h: h.cost, reverse=True):
+            print(f"    hatch angle {hatch.angle}, spacing {hatch.spacing}, "
+                  f"slice_height {hatch.slice_height}: est {hatch.cost:.1f}s "
+                  f"(values {_format_uses(hatch.uses, multiple_jobs)})")
+
+    requested_geometry = sum(len(g.uses) for g in plan.geometry.values())
+    requested_hatches = sum(len(h.uses) for h in plan.hatches.values())
+    print(f"{len(plan.geometry)} geometry tasks ({requested_geometry} requested), "
+          f"{len(plan.hatches)} hatch tasks ({requested_hatches} requested)")
+    print(f"projected runtime: {plan.projected_runtime(1):.1f}s on 1 worker", end="")
+    if workers > 1:
+        print(f", {plan.projected_runtime(workers):.1f}s on {workers} workers")
+    else:
+        print()
+
+
+def _hatch_args(hatch, geometry_result):
+    return (geometry_result, hatch.angle, hatch.spacing, hatch.slice_height, hatch.config)
+
+
+def run_plan(plan, executor=None):
+    """Execute every task once, longest first, and write each job's SVGs.
+
+    Without an executor tasks run in this process in priority order. With
+    one, geometry tasks are queued longest chain first and each one's hatch
+    passes are queued, longest first, as soon as it finishes.
+    """
+    geometry_results = {}
+    hatch_results = {}
+
+    if executor is None:
+        for geometry in plan.ordered_geometry():
+            geometry_results[geometry.key] = prepare_value_geometry(geometry.paths,
+                                                                    geometry.config)
+            if geometry_results[geometry.key] is None:
+                continue
+            for hatch in sorted(geometry.hatches, key=lambda h: h.cost, reverse=True):
+                hatch_results[hatch.key] = hatch_value_pass(
+                    *_hatch_args(hatch, geometry_results[geometry.key]))
+    else:
+        pending = {}
+        for geometry in plan.ordered_geometry():
+            task = executor.submit(prepare_value_geometry, geometry.paths, geometry.config)
+            pending[task] = geometry
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = pending.pop(future)
+                if isinstance(task, GeometryTask):
+                    geometry_results[task.key] = future.result()
+                    if geometry_results[task.key] is None:
+                        continue
+                    for hatch in sorted(task.hatches, key=lambda h: h.cost, reverse=True):
+                        args = _hatch_args(hatch, geometry_results[task.key])
+                        pending[executor.submit(hatch_value_pass, *args)] = hatch
+                else:
+                    hatch_results[task.key] = future.result()
+
+    for job in plan.jobs:
+        if job.errors:
+            continue
+        results = []
+        for value, geometry, hatches in job.values:
+            if geometry is None or geometry_results[geometry.key] is None:
+                print(f"no paths for value {value}. Continuing...")
+                continue
+            zigzags = []
+            for hatch in hatches:
+                zigzags.extend(hatch_results[hatch.key])
+            results.append((value, collect_value(geometry_results[geometry.key], zigzags,
+                                                 job.config)))
+        save_outputs(job.config, job.svg_attrs, results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate configs, print the deduplicated task plan and run it.")
+    parser.add_argument("configs", nargs="+")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the plan and projected runtime without running it")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    configs = []
+    for path in args.configs:
+        try:
+            configs.append((path, Config(path)))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{path}\n  error: could not load config: {type(e).__name__}: {e}")
+            sys.exit(1)
+
+    plan = build_plan(configs)
+    print_plan(plan, workers=args.workers)
+
+    if plan.has_errors():
+        sys.exit(1)
+    if args.dry_run:
+        return
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            run_plan(plan, executor)
+    else:
+        run_plan(plan)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.dom.minidom import parse as parse_xml
+from svgpathtools import parse_path
+from svgpathtools.svg_to_paths import polyline2pathd, polygon2pathd, ellipse2pathd, rect2pathd
+from path_utils import filter_paths_by_color, svgpath_to_shapely_polygon, hatch_path
+from main import (
+    prepare_value_geometry,
+    hatch_value_pass,
+    collect_value,
+    save_outputs,
+    get_output_paths
+)
+from config import Config
+
+
+class LRUCache:
+    """A mapping that drops its least recently used entries past `max_entries`."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def keys(self):
+        return list(self._entries)
+
+    def values(self):
+        return list(self._entries.values())
+
+
+class PathCache:
+    """Per-path geometry keyed by the path's `d` string.
+
+    Input polygons, merged path areas and hatch_path output are cached per
+    path, so after an edit only the paths whose outline changed are
+    resampled and re-hatched. Least recently used entries are dropped past
+    `max_entries`.
+    """
+
+    def __init__(self, max_entries=50000):
+        self._results = LRUCache(max_entries)
+        # d() is recomputed on every call, so remember it per Path object
+        self._names = LRUCache(max_entries)
+
+    def __len__(self):
+        return len(self._results)
+
+    def _d(self, path):
+        entry = self._names.get(id(path))
+        if entry is None or entry[0] is not path:
+            entry = (path, path.d())
+            self._names.put(id(path), entry)
+        return entry[1]
+
+    def _cached(self, key, compute):
+        result = self._results.get(key)
+        if result is None:
+            result = compute()
+            self._results.put(key, result)
+        return result
+
+    def remove_duplicates(self, paths):
+        """path_utils.remove_duplicate_paths without recomputing known `d` strings."""
+        seen = set()
+        unique = []
+        for path in paths:
+            d = self._d(path)
+            if d not in seen:
+                seen.add(d)
+                unique.append(path)
+        return unique
+
+    def polygon(self, path):
+        return self._cached(("polygon", self._d(path)),
+                            lambda: svgpath_to_shapely_polygon(path))
+
+    def area(self, path):
+        return self._cached(("area", self._d(path)),
+                            lambda: svgpath_to_shapely_polygon(path).area)
+
+    def hatch(self, path, angle, step, slice_height, config):
+        key = ("hatch", self._d(path), angle, step, slice_height, config.overshoot,
+               config.path_buffer, config.x_tolerance_epsilon)
+        return self._cached(key, lambda: hatch_path(
+            path,
+            angle,
+            step,
+            slice_height,
+            overshoot=config.overshoot,
+            path_buffer=config.path_buffer,
+            x_tolerance_epsilon=config.x_tolerance_epsilon))
+
+
+def _dom2dict(element):
+    return dict(zip(element.attributes.keys(),
+                    (attr.value for attr in element.attributes.values())))
+
+
+def _read_svg(input_path):
+    """The d strings, attributes and svg attributes svg2paths2 would return.
+
+    The elements are read in svg2paths2's order but their d strings are
+    not parsed, which is most of svg2paths2's time.
+    """
+    doc = parse_xml(input_path)
+    converters = (
+        ("path", lambda el: el["d"]),
+        ("polyline", polyline2pathd),
+        ("polygon", lambda el: polygon2pathd(el, True)),
+        ("line", lambda el: "M" + el["x1"] + " " + el["y1"] + "L" + el["x2"] + " " + el["y2"]),
+        ("ellipse", ellipse2pathd),
+        ("circle", ellipse2pathd),
+        ("rect", rect2pathd),
+    )
+    d_strings = []
+    attrs = []
+    for tag, to_d in converters:
+        for element in doc.getElementsByTagName(tag):
+            attr = _dom2dict(element)
+            d_strings.append(to_d(attr))
+            attrs.append(attr)
+    svg_attrs = _dom2dict(doc.getElementsByTagName("svg")[0])
+    doc.unlink()
+    return d_strings, attrs, svg_attrs
+
+
+def _load_config(config_path):
+    """Load and validate a config; errors raise ValueError so requests get a 400."""
+    config = Config(config_path)
+    errors, warnings = config.validate()
+    if errors:
+        raise ValueError("; ".join(errors))
+    return config, warnings
+
+
+def _output_stamps(config):
+    stamps = []
+    for output_path in get_output_paths(config):
+        try:
+            stamps.append(os.path.getmtime(output_path))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+class HatchWorkspace:
+    """Keeps parsed SVGs, merged tones and hatched paths in memory.
+
+    SVGs are re-read when their mtime changes, and only `d` strings that
+    were not seen before are parsed into Paths again. A tone keeps its merged
+    geometry as long as the `d` attributes of its paths are unchanged, and
+    the per-path work behind it lives in a PathCache, so an edit only
+    recomputes the paths it actually touched. Every cache is an LRU.
+    """
+
+    def __init__(self, max_svgs=8, max_tones=256, max_path_entries=50000):
+        self.lock = threading.RLock()
+        self.paths = PathCache(max_path_entries)
+        self._svgs = LRUCache(max_svgs)
+        self._parsed = LRUCache(max_path_entries)
+        self._tones = LRUCache(max_tones)
+        self._rendered = LRUCache(max_tones)
+
+    def load_svg(self, input_path):
+        input_path = os.path.abspath(input_path)
+        mtime = os.path.getmtime(input_path)
+        svg = self._svgs.get(input_path)
+        if svg is None or svg["mtime"] != mtime:
+            d_strings, attrs, svg_attrs = _read_svg(input_path)
+            all_paths = []
+            for d in d_strings:
+                path = self._parsed.get(d)
+                if path is None:
+                    path = parse_path(d)
+                    self._parsed.put(d, path)
+                all_paths.append(path)
+            svg = {
+                "path": input_path,
+                "mtime": mtime,
+                "paths": all_paths,
+                "attrs": attrs,
+                "svg_attrs": svg_attrs,
+            }
+            self._svgs.put(input_path, svg)
+        return svg
+
+    def _tone(self, svg, color):
+        key = (svg["path"], color)
+        tone = self._tones.get(key)
+        if tone is not None and tone["mtime"] == svg["mtime"]:
+            return tone
+
+        digest = hashlib.sha1()
+        for attr in filter_paths_by_color(svg["attrs"], svg["attrs"], color):
+            digest.update(attr.get("d", "").encode())
+            digest.update(b"\0")
+        digest = digest.hexdigest()
+
+        if tone is None or tone["digest"] != digest:
+            tone = {
+                "digest": digest,
+                "paths": filter_paths_by_color(svg["paths"], svg["attrs"], color),
+                "area_key": None,
+                "geometry": None,
+            }
+        tone["mtime"] = svg["mtime"]
+        self._tones.put(key, tone)
+        return tone
+
+    def hatch_value(self, config, value):
+        """Cached equivalent of main.hatch_value for an unfiltered SVG."""
+        svg = self.load_svg(config.get_input_path())
+        tone = self._tone(svg, config.get_color(value))
+
+        area_key = (config.get_min_area(), config.get_max_area())
+        if tone["area_key"] != area_key:
+            tone["geometry"] = prepare_value_geometry(tone["paths"], config,
+                                                      verbose=False, cache=self.paths)
+            tone["area_key"] = area_key
+        geometry = tone["geometry"]
+        if geometry is None:
+            return None
+
+        zigzags_for_value = []
+        for angle, step, slice_height in config.get_hatch_passes(value):
+            zigzags_for_value.extend(hatch_value_pass(geometry, angle, step, slice_height,
+                                                      config, verbose=False, cache=self.paths))
+
+        return collect_value(geometry, zigzags_for_value, config, verbose=False)
+
+    def render(self, config_path, only_if_changed=False):
+        """Regenerate the output SVGs of a config, reusing cached geometry.
+
+        With `only_if_changed` nothing is written when the config, its tone
+        geometry and the output files are all as the last render left them.
+        """
+        started = time.perf_counter()
+        config, warnings = _load_config(config_path)
+        with self.lock:
+            svg = self.load_svg(config.get_input_path())
+            results = []
+            digests = []
+            for value in config.get_values_to_process():
+                result = self.hatch_value(config, value)
+                digests.append(self._tone(svg, config.get_color(value))["digest"])
+                if result is not None:
+                    results.append((value, result))
+
+            # outputs are fully determined by the config and the tone geometry,
+            # unless someone else deleted or rewrote them since
+            fingerprint = (json.dumps(config.cfg_dict, sort_keys=True), tuple(digests))
+            rendered = self._rendered.get(os.path.abspath(config_path))
+            unchanged = (only_if_changed and rendered is not None
+                         and rendered == (fingerprint, _output_stamps(config)))
+            if not unchanged:
+                save_outputs(config, svg["svg_attrs"], results)
+                self._rendered.put(os.path.abspath(config_path),
+                                   (fingerprint, _output_stamps(config)))
+        return {
+            "config": config_path,
+            "values": [str(value) for value, _ in results],
+            "zigzags": sum(len(result[1]) for _, result in results),
+            "written": not unchanged,
+            "warnings": warnings,
+            "elapsed_s": time.perf_counter() - started,
+        }
+
+    def hatch(self, config_path, value):
+        """Return the zigzag and outline paths of one value as `d` strings."""
+        config, _ = _load_config(config_path)
+        with self.lock:
+            result = self.hatch_value(config, value)
+        if result is None:
+            return {"zigzags": [], "outlines": []}
+        _, zigzags, paths_to_outline = result
+        return {
+            "zigzags": [p.d() for p in zigzags],
+            "outlines": [p.d() for p in paths_to_outline],
+        }
+
+    def status(self):
+        with self.lock:
+            return {
+                "svgs": sorted(self._svgs.keys()),
+                "tones": len(self._tones),
+                "cached_path_results": len(self.paths),
+            }
+
+
+class ConfigWatcher(threading.Thread):
+    """Polls watched configs and their input SVGs and re-renders on change."""
+
+    def __init__(self, workspace, interval=0.5):
+        super().__init__(daemon=True)
+        self.workspace = workspace
+        self.interval = interval
+        self._stamps = {}
+        self._lock = threading.Lock()
+
+    def _stamp(self, config_path):
+        stamp = [os.path.getmtime(config_path)]
+        try:
+            stamp.append(os.path.getmtime(Config(config_path).get_input_path()))
+        except Exception:
+            pass
+        return tuple(stamp)
+
+    def watch(self, config_path):
+        with self._lock:
+            self._stamps[config_path] = self._stamp(config_path)
+
+    def watched(self):
+        with self._lock:
+            return sorted(self._stamps)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            for config_path in self.watched():
+                try:
+                    stamp = self._stamp(config_path)
+                except OSError:
+                    continue
+                if stamp == self._stamps.get(config_path):
+                    continue
+                with self._lock:
+                    self._stamps[config_path] = stamp
+                try:
+                    summary = self.workspace.render(config_path, only_if_changed=True)
+                    print(f"regenerated {config_path} in {summary['elapsed_s']:.2f}s")
+                except Exception as e:
+                    print(f"failed to regenerate {config_path}: {type(e).__name__}: {e}")
+
+
+class HatchRequestHandler(BaseHTTPRequestHandler):
+    """JSON API.
+
+    GET  /status                      cache and watch status
+    POST /render {"config", "watch"}  regenerate a config's output SVGs
+    POST /hatch  {"config", "value"}  return one value's paths as `d` strings
+    """
+
+    def _send_json(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        status = self.server.workspace.status()
+        status["watching"] = self.server.watcher.watched()
+        self._send_json(200, status)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/render":
+                body = self.server.workspace.render(request["config"])
+                if request.get("watch"):
+                    self.server.watcher.watch(request["config"])
+            elif self.path == "/hatch":
+                body = self.server.workspace.hatch(request["config"], request["value"])
+            else:
+                self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+                return
+        except (KeyError, ValueError, OSError) as e:
+            self._send_json(400, {"error": f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve hatch requests from in-memory geometry and regenerate on change.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--watch", nargs="*", default=[],
+                        help="configs to render now and regenerate whenever they or their SVG change")
+    parser.add_argument("--interval", type=float, default=0.5,
+                        help="seconds between file change checks")
+    args = parser.parse_args()
+
+    workspace = HatchWorkspace()
+    watcher = ConfigWatcher(workspace, interval=args.interval)
+    for config_path in args.watch:
+        summary = workspace.render(config_path)
+        print(f"rendered {config_path} in {summary['elapsed_s']:.2f}s")
+        watcher.watch(config_path)
+    watcher.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), HatchRequestHandler)
+    server.workspace = workspace
+    server.watcher = watcher
+    print(f"serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()